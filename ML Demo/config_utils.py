@@ -17,6 +17,34 @@ logging.basicConfig(
 # Type variable for generic function return type
 T = TypeVar('T')
 
+def write_json_if_changed(path: str, data: Dict[str, Any]) -> bool:
+    """
+    Write data to a JSON file only if its contents would change.
+    
+    The new contents go to a temporary file in the same directory which then replaces
+    the original, so readers never see a partially written file.
+    
+    Args:
+        path: Path of the JSON file
+        data: Data to serialize
+        
+    Returns:
+        True if the file was written, False if it was already up to date
+    """
+    new_contents = json.dumps(data, indent=4)
+    try:
+        with open(path, "r") as existing_file:
+            if existing_file.read() == new_contents:
+                return False
+    except FileNotFoundError:
+        pass
+    
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as temp_file:
+        temp_file.write(new_contents)
+    os.replace(temp_path, path)
+    return True
+
 class ConfigurationManager:
     """
     Utility class for managing configuration across the application.
@@ -29,6 +57,8 @@ class ConfigurationManager:
         self.config = {}
         self.settings = {}
         self.last_refresh_time = 0
+        # Incremented every time settings are (re)loaded, however the reload was triggered
+        self.settings_version = 0
         self.refresh_interval = 60  # Refresh settings every 60 seconds
         
         # Load initial configuration
@@ -67,6 +97,7 @@ class ConfigurationManager:
                 with open(self.settings_path, "r") as settings_file:
                     settings_data = json.load(settings_file)
                     self.settings = settings_data.get("Values", {})
+                self.settings_version += 1
                 logging.info(f"Loaded settings from {self.settings_path}")
             else:
                 logging.warning(f"Settings file {self.settings_path} not found")
@@ -262,10 +293,12 @@ class ConfigurationManager:
                 if value:  # Only update if value is not empty
                     values[key] = value
             
-            # Save updated settings
+            # Save updated settings, leaving the file untouched if nothing changed so
+            # file watchers (e.g. Functions Core Tools) don't reload for nothing
             settings_data["Values"] = values
-            with open(self.settings_path, "w") as settings_file:
-                json.dump(settings_data, settings_file, indent=4)
+            if not write_json_if_changed(self.settings_path, settings_data):
+                logging.info(f"Service settings in {self.settings_path} are already up to date")
+                return
             
             # Reload settings
             self._load_settings()
@@ -160,14 +160,8 @@ try:
 except:
     pass
 
-# Sort resources to delete dependent resources first
-# This helps avoid dependency conflicts during deletion
-resources_to_delete = []
-for resource in resources:
-    resources_to_delete.append(resource)
-
 # Process resources
-for resource in resources_to_delete:
+for resource in resources:
     resource_id = resource.id
     resource_name = resource.name
     resource_type = resource.type
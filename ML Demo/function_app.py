@@ -1,16 +1,39 @@
 import json
+import asyncio
+import atexit
 import logging
-import base64
 import os
 import time
 import sys
+import uuid
+import threading
 import datetime
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List
+import requests
+from requests.adapters import HTTPAdapter
 from PIL import Image
+
+# pybase64 uses a SIMD codec that is several times faster than the standard library base64
+# module on image-sized buffers, with the same b64encode/b64decode API
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+# orjson is much faster than the standard library json module; fall back when it isn't installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
 import azure.functions as func
 from azureml.core import Workspace, Experiment
 from azure.storage.blob import BlobServiceClient
 from azure.eventhub import EventHubProducerClient, EventData
 from azure.identity import DefaultAzureCredential
+from azure.core.pipeline.transport import RequestsTransport
+from azure.core.exceptions import ClientAuthenticationError, HttpResponseError, ResourceNotFoundError
 from azure.ai.ml import MLClient
 from azure.ai.ml.entities import Model, ManagedOnlineEndpoint, ManagedOnlineDeployment
 from azure.ai.ml.entities import Environment
@@ -24,6 +47,9 @@ from config_utils import ConfigurationManager
 # Create configuration manager
 config_manager = ConfigurationManager()
 
+# The Azure SDKs log every HTTP request at INFO; keep them quiet on the per-event path
+logging.getLogger("azure").setLevel(logging.WARNING)
+
 # Required settings for the Azure Functions
 REQUIRED_SETTINGS = [
     "AZURE_BLOB_STORAGE_CONNECTION_STRING", 
@@ -49,12 +75,6 @@ print(f"Storage account: {storage_account}")
 print(f"Training container: {training_container_name}")
 print(f"Models container: {models_container_name}")
 
-# Get Azure ML settings
-subscription_id = config_manager.get_setting("AZURE_ML_SUBSCRIPTION_ID")
-resource_group = config_manager.get_setting("AZURE_ML_RESOURCE_GROUP")
-workspace_name = config_manager.get_setting("AZURE_ML_WORKSPACE_NAME")
-
-
 # Validate required settings
 missing_settings = config_manager.validate_required_settings(REQUIRED_SETTINGS)
 if missing_settings:
@@ -63,12 +83,108 @@ if missing_settings:
 else:
     logging.info("All required settings are available")
 
+# Separate pooled session for the Azure SDK clients. It has no urllib3 retries
+# mounted because the azure-core pipeline does its own retrying.
+_AZURE_SESSION = requests.Session()
+_AZURE_SESSION.mount("https://", HTTPAdapter(pool_connections=20, pool_maxsize=100))
+_AZURE_TRANSPORT = RequestsTransport(
+    session=_AZURE_SESSION,
+    session_owner=False,
+    connection_timeout=5,
+    read_timeout=30
+)
+
+# Shared credential so its token cache is reused across invocations instead of
+# re-probing every auth source and fetching a new token each time
+_CREDENTIAL = DefaultAzureCredential(
+    exclude_visual_studio_code_credential=True,
+    exclude_interactive_browser_credential=True
+)
+
+# MLClient instances keyed by (subscription, resource group, workspace)
+_ML_CLIENTS = {}
+_ML_LOCK = threading.Lock()
+
+# Training images from one trigger batch are uploaded in parallel
+_upload_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="training-upload")
+
+# (id(MLClient), datastore name) -> time the datastore was last confirmed to exist
+_DATASTORE_CACHE = {}
+DATASTORE_CACHE_TTL = 300  # seconds
+
+# JPEG start-of-image marker, used to tell raw image events from Base64 ones
+JPEG_SIGNATURE = b"\xff\xd8\xff"
+
+# Connection strings that have already been verified against blob storage
+_BLOB_VERIFIED = set()
+
+# (time computed, serialized status) of the last health check, so frequent probes
+# from a monitor are answered from memory
+_HEALTH_CACHE = None
+HEALTH_CACHE_TTL = 5  # seconds
+
+@dataclass(frozen=True)
+class FunctionSettings:
+    """Snapshot of the settings used by the functions, bound once per configuration reload"""
+    event_hub_connection: str
+    alphabet_event_hub: str
+    predictions_event_hub: str
+    ml_subscription_id: str
+    ml_resource_group: str
+    ml_workspace_name: str
+    ml_prediction_endpoint: str
+    ml_key: str
+    model_datastore: str
+
+# Setting key in local.settings.json for each FunctionSettings field
+SETTINGS_KEYS = {
+    "event_hub_connection": "EventHubConnectionString",
+    "alphabet_event_hub": "ALPHABET_EVENT_HUB",
+    "predictions_event_hub": "PREDICTIONS_EVENT_HUB",
+    "ml_subscription_id": "AZURE_ML_SUBSCRIPTION_ID",
+    "ml_resource_group": "AZURE_ML_RESOURCE_GROUP",
+    "ml_workspace_name": "AZURE_ML_WORKSPACE_NAME",
+    "ml_prediction_endpoint": "AZURE_ML_PREDICTION_ENDPOINT",
+    "ml_key": "AZURE_ML_KEY",
+    "model_datastore": "AZURE_MODEL_DATASTORE_NAME"
+}
+SETTINGS_FIELDS = {key: field for field, key in SETTINGS_KEYS.items()}
+
+# (settings version, FunctionSettings) for the currently loaded configuration
+_settings_snapshot = None
+
+def get_settings():
+    """
+    Get the current settings snapshot.
+    
+    The snapshot is only rebuilt when the configuration manager has reloaded its settings,
+    so handlers read settings as plain attributes instead of per-key lookups.
+    
+    Returns:
+        FunctionSettings for the currently loaded configuration
+    """
+    global _settings_snapshot
+    config_manager.refresh_config()
+    
+    # Keyed on the settings version rather than the refresh time, so settings reloaded
+    # outside the refresh interval (e.g. by update_service_settings) are picked up too
+    version = config_manager.settings_version
+    if _settings_snapshot is None or _settings_snapshot[0] != version:
+        settings = FunctionSettings(**{
+            field: config_manager.settings.get(key) or ""
+            for field, key in SETTINGS_KEYS.items()
+        })
+        _settings_snapshot = (version, settings)
+    
+    return _settings_snapshot[1]
+
 # Helper functions to get connection settings
 
 def get_event_hub_connection(event_hub_name_key="ALPHABET_EVENT_HUB"):
     """Get Event Hub connection settings with automatic refresh"""
-    event_hub_connection_str = config_manager.get_setting("EventHubConnectionString")
-    event_hub_name = config_manager.get_setting(event_hub_name_key)
+    settings = get_settings()
+    event_hub_connection_str = settings.event_hub_connection
+    event_hub_name = getattr(settings, SETTINGS_FIELDS[event_hub_name_key])
     
     if not event_hub_connection_str or not event_hub_name:
         logging.error(f"Event Hub connection settings are missing for {event_hub_name_key}")
@@ -100,72 +216,160 @@ def get_blob_storage_connection(for_models=False):
         logging.error(f"{container_type} blob storage connection settings are missing")
         return None, None
     
-    logging.info(f"Using storage account: {storage_account} with container: {container_name}")
+    logging.debug("Using storage account: %s with container: %s", storage_account, container_name)
     
-    # Verify the connection string is valid
-    try:
-        blob_service_client = BlobServiceClient.from_connection_string(connection_string)
-        # Try to list containers to verify connection
-        next(blob_service_client.list_containers(), None)
-        logging.info("✅ Successfully connected to blob storage")
-    except Exception as e:
-        logging.error(f"❌ Failed to connect to blob storage: {str(e)}")
-        return None, None
+    # Verify the connection string is valid (once per connection string, not on every event)
+    if connection_string not in _BLOB_VERIFIED:
+        try:
+            blob_service_client = _get_blob_service(connection_string)
+            # Try to list containers to verify connection
+            next(blob_service_client.list_containers(), None)
+            _BLOB_VERIFIED.add(connection_string)
+            logging.info("✅ Successfully connected to blob storage")
+        except Exception as e:
+            logging.error(f"❌ Failed to connect to blob storage: {str(e)}")
+            return None, None
     
     return connection_string, container_name
 
+@functools.lru_cache(maxsize=8)
+def _get_blob_service(connection_string):
+    """Get a BlobServiceClient per connection string so its connection pool is reused"""
+    blob_service_client = BlobServiceClient.from_connection_string(
+        connection_string,
+        transport=_AZURE_TRANSPORT,
+        retry_total=3,
+        retry_backoff_factor=0.8
+    )
+    atexit.register(blob_service_client.close)
+    return blob_service_client
+
 def get_ml_workspace():
-    """Get Azure ML workspace client"""
+    """
+    Get the Azure ML workspace client.
+    
+    The client is created once per workspace and reused across invocations, so its
+    HTTP connection pool and token cache survive between warm calls.
+    
+    Returns:
+        MLClient for the configured workspace, or None if it can't be created
+    """
     try:
-        credential = DefaultAzureCredential()
-        subscription_id = config_manager.get_setting("AZURE_ML_SUBSCRIPTION_ID")
-        resource_group = config_manager.get_setting("AZURE_ML_RESOURCE_GROUP")
-        workspace_name = config_manager.get_setting("AZURE_ML_WORKSPACE_NAME")
+        settings = get_settings()
         
-        if not all([subscription_id, resource_group, workspace_name]):
+        if not all([settings.ml_subscription_id, settings.ml_resource_group, settings.ml_workspace_name]):
             logging.error("Missing required ML workspace settings")
             return None
         
-        ml_client = MLClient(
-            credential=credential,
-            subscription_id=subscription_id,
-            resource_group_name=resource_group,
-            workspace_name=workspace_name
-        )
+        workspace_key = (settings.ml_subscription_id, settings.ml_resource_group, settings.ml_workspace_name)
+        ml_client = _ML_CLIENTS.get(workspace_key)
+        if ml_client is None:
+            with _ML_LOCK:
+                ml_client = _ML_CLIENTS.get(workspace_key)
+                if ml_client is None:
+                    ml_client = MLClient(
+                        credential=_CREDENTIAL,
+                        subscription_id=settings.ml_subscription_id,
+                        resource_group_name=settings.ml_resource_group,
+                        workspace_name=settings.ml_workspace_name,
+                        transport=_AZURE_TRANSPORT
+                    )
+                    _ML_CLIENTS[workspace_key] = ml_client
         return ml_client
     except Exception as e:
         logging.error(f"Error connecting to ML workspace: {str(e)}")
         return None
 
+@functools.lru_cache(maxsize=4)
+def _get_training_workspace(subscription_id, resource_group, workspace_name):
+    """
+    Get the azureml.core Workspace used to submit training runs.
+    
+    Cached per workspace so the timer trigger doesn't re-read config and
+    re-authenticate on every tick.
+    
+    Args:
+        subscription_id: Azure subscription ID
+        resource_group: Resource group of the ML workspace
+        workspace_name: Name of the ML workspace
+        
+    Returns:
+        Workspace: The training workspace
+    """
+    return Workspace(subscription_id, resource_group, workspace_name)
+
+def event_image_bytes(body: bytes) -> bytes:
+    """
+    Get the image bytes carried by an image event.
+    
+    Producers send the JPEG bytes as is; Base64 text from older producers is still
+    accepted. Base64 never starts with the JPEG marker byte, so the two can't be confused.
+    
+    Args:
+        body: Raw event body
+        
+    Returns:
+        bytes: The decoded image
+    """
+    if body[:3] == JPEG_SIGNATURE:
+        return body
+    return base64.b64decode(body)
+
+def event_labels(events: List[func.EventHubEvent]) -> List[str]:
+    """
+    Get the label of every event in a trigger batch.
+    
+    With cardinality "many", event.metadata is the batch-wide trigger metadata, so each
+    event's application properties are read by index from its PropertiesArray.
+    
+    Args:
+        events: Events delivered to a cardinality "many" trigger
+        
+    Returns:
+        List with one label per event, 'unknown' where none was set
+    """
+    properties_array = (events[0].metadata.get('PropertiesArray') or []) if events else []
+    labels = []
+    for index in range(len(events)):
+        event_properties = properties_array[index] if index < len(properties_array) else None
+        labels.append((event_properties or {}).get('label', 'unknown'))
+    return labels
+
+def base64_decoded_size(data: bytes) -> int:
+    """
+    Get the size in bytes of base64 encoded data without decoding it.
+    
+    Args:
+        data: Base64 encoded bytes
+    
+    Returns:
+        Number of bytes the data decodes to
+    """
+    padding = len(data) - len(data.rstrip(b"="))
+    return (len(data) * 3) // 4 - padding
+
+def _json_dumps(obj) -> bytes:
+    """Serialize an object to JSON bytes, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
+
 # Initialize Azure Function App
 app = func.FunctionApp()
 
 # Event Hub triggers for image storage and training data
-@app.event_hub_message_trigger(arg_name="event", event_hub_name="alphabet-topic", connection="EventHubConnectionString", cardinality="one", consumer_group="image_save")
-def store_training_data(event: func.EventHubEvent):
-    """Store images with labels in ML workspace storage for training"""
+@app.event_hub_message_trigger(arg_name="events", event_hub_name="alphabet-topic", connection="EventHubConnectionString", cardinality="many", consumer_group="image_save")
+def store_training_data(events: List[func.EventHubEvent]) -> None:
+    """Store a batch of images with labels in ML workspace storage for training"""
     try:
-        # Get the event data and properties
-        event_body = event.get_body().decode('utf-8')
-        event_properties = event.metadata.get('Properties', {})
-        label = event_properties.get('label', 'unknown')
-        
-        # Log the incoming data
-        image_size_kb = len(base64.b64decode(event_body)) / 1024
-        logging.info(f"📥 Received image of size: {image_size_kb:.2f} KB with label: {label}")
-        
         # Get blob storage connection for training data (not models)
         storage_connection_string, container_name = get_blob_storage_connection(for_models=False)
         if not storage_connection_string or not container_name:
             logging.error("Cannot store training data: Missing storage settings")
             return
-            
-        # Create a unique filename with timestamp and label
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"training_data/{label}/{timestamp}.jpg"
         
-        # Connect to blob storage and ensure container exists
-        blob_service_client = BlobServiceClient.from_connection_string(storage_connection_string)
+        # Connect to blob storage and ensure container exists, once for the whole batch
+        blob_service_client = _get_blob_service(storage_connection_string)
         container_client = blob_service_client.get_container_client(container_name)
         
         # Create container if it doesn't exist
@@ -175,117 +379,196 @@ def store_training_data(event: func.EventHubEvent):
             logging.info(f"Creating container: {container_name}")
             container_client.create_container()
         
-        # Upload the image with retry logic
-        max_retries = 3
-        retry_delay = 1  # seconds
-        
-        for attempt in range(max_retries):
-            try:
-                blob_client = container_client.get_blob_client(filename)
-                blob_client.upload_blob(base64.b64decode(event_body), overwrite=True)
-                logging.info(f"✅ Stored training image with label '{label}' as {filename}")
-                break
-            except Exception as upload_error:
-                if attempt == max_retries - 1:  # Last attempt
-                    raise upload_error
-                logging.warning(f"Upload attempt {attempt + 1} failed: {str(upload_error)}")
-                time.sleep(retry_delay * (2 ** attempt))  # Exponential backoff
+        # Uploads are I/O bound, so the batch is stored in parallel
+        stored = sum(_upload_executor.map(
+            lambda event, label: _store_training_image(container_client, event, label),
+            events,
+            event_labels(events)
+        ))
+        logging.info("✅ Stored %d of %d training images", stored, len(events))
         
     except Exception as e:
         logging.error(f"❌ Error storing training data: {str(e)}")
 
-# Event Hub trigger for image prediction
-@app.event_hub_message_trigger(arg_name="event", event_hub_name="alphabet-topic", connection="EventHubConnectionString", cardinality="one", consumer_group="image_prediction")
-def process_single_image(event: func.EventHubEvent):
-    """Process image for prediction (strips label) and sends to ML endpoint"""
+def _store_training_image(container_client, event: func.EventHubEvent, label: str) -> bool:
+    """
+    Upload one training image event to blob storage.
+    
+    Args:
+        container_client: Container the training images are stored in
+        event: Event Hub event carrying the image
+        label: Label of the image, from the batch's PropertiesArray
+        
+    Returns:
+        bool: True if the image was stored, False otherwise
+    """
     try:
-        # Get the event data and properties
-        event_body = event.get_body().decode('utf-8')
-        event_properties = event.metadata.get('Properties', {})
-        label = event_properties.get('label', 'unknown')
+        # Get the image bytes (sent raw, or Base64 encoded by older producers)
+        image_data = event_image_bytes(event.get_body())
+        logging.debug("📥 Received image of size: %.2f KB with label: %s", len(image_data) / 1024, label)
         
-        # Log the original image and label
-        image_size_kb = len(base64.b64decode(event_body)) / 1024
-        logging.info(f"✅ Processing image of size: {image_size_kb:.2f} KB with label: {label}")
+        # Create a unique filename with label, nanosecond timestamp and a random suffix so
+        # images arriving in the same second (or on parallel workers) don't overwrite each other
+        filename = f"training_data/{label}/{time.time_ns()}_{uuid.uuid4().hex[:12]}.jpg"
+        
+        # Upload the image; transient failures are retried with backoff by the client's pipeline
+        blob_client = container_client.get_blob_client(filename)
+        # Passing the length lets the SDK use a single Put Blob instead of staging blocks
+        blob_client.upload_blob(image_data, overwrite=True, length=len(image_data))
+        logging.debug("✅ Stored training image with label '%s' as %s", label, filename)
+        return True
         
+    except Exception as e:
+        logging.error(f"❌ Error storing training image: {str(e)}")
+        return False
+
+# Event Hub trigger for image prediction
+@app.event_hub_message_trigger(arg_name="events", event_hub_name="alphabet-topic", connection="EventHubConnectionString", cardinality="many", consumer_group="image_prediction")
+def process_single_image(events: List[func.EventHubEvent]) -> None:
+    """Process a batch of images for prediction (strips labels) and sends them to ML endpoint"""
+    try:
         # Get ML endpoint settings
-        prediction_endpoint = config_manager.get_setting("AZURE_ML_PREDICTION_ENDPOINT")
-        ml_key = config_manager.get_setting("AZURE_ML_KEY")
+        settings = get_settings()
+        prediction_endpoint = settings.ml_prediction_endpoint
+        ml_key = settings.ml_key
         
         if not prediction_endpoint or not ml_key:
             logging.error("Missing ML endpoint settings")
             return
-            
         
-        # MARK - Commented out for now as we don't have the ML endpoint
-        # Send to ML endpoint for prediction
-        # try:
-        #     # Import here to avoid errors if package not installed
-        #     from azure.ai.ml import MLClient
-        #     from azure.core.credentials import AzureKeyCredential
-        #     from azure.ai.ml.entities import Model, Environment, CodeConfiguration
-        #     from azure.ai.ml.constants import AssetTypes
+        for event, label in zip(events, event_labels(events)):
+            # Get the event data
+            event_body = event.get_body()
+            
+            # Raw JPEG events are measured directly; Base64 events from older producers
+            # are measured without a decode
+            if event_body[:3] == JPEG_SIGNATURE:
+                image_size_kb = len(event_body) / 1024
+            else:
+                image_size_kb = base64_decoded_size(event_body) / 1024
+            
+            # Log the original image and label
+            logging.debug("✅ Processing image of size: %.2f KB with label: %s", image_size_kb, label)
+            
+            # MARK - Commented out for now as we don't have the ML endpoint
+            # Send to ML endpoint for prediction
+            # try:
+            #     # Import here to avoid errors if package not installed
+            #     from azure.ai.ml import MLClient
+            #     from azure.core.credentials import AzureKeyCredential
+            #     from azure.ai.ml.entities import Model, Environment, CodeConfiguration
+            #     from azure.ai.ml.constants import AssetTypes
             
-        #     # Create headers for the request
-        #     headers = {
-        #         "Authorization": f"Bearer {ml_key}",
-        #         "Content-Type": "application/json"
-        #     }
+            #     # Create headers for the request
+            #     headers = {
+            #         "Authorization": f"Bearer {ml_key}",
+            #         "Content-Type": "application/json"
+            #     }
             
-        #     # Create payload (image without label)
-        #     payload = {
-        #         "input_data": {
-        #             "columns": ["image"],
-        #             "data": [event_body]  # Send base64 image only, without label
-        #         }
-        #     }
+            #     # Create payload (image without label)
+            #     payload = {
+            #         "input_data": {
+            #             "columns": ["image"],
+            #             "data": [event_body]  # Send base64 image only, without label
+            #         }
+            #     }
             
-        #     # Make prediction request
-        #     import requests
-        #     response = requests.post(
-        #         prediction_endpoint,
-        #         headers=headers,
-        #         json=payload
-        #     )
+            #     # Make prediction request
+            #     import requests
+            #     response = requests.post(
+            #         prediction_endpoint,
+            #         headers=headers,
+            #         json=payload
+            #     )
             
             
-        #     # if response.status_code == 200:
-        #     #     prediction_result = response.json()
+            #     # if response.status_code == 200:
+            #     #     prediction_result = response.json()
                 
-        #     #     # Send prediction results to predictions event hub
-        #     #     event_hub_connection_str, predictions_event_hub = get_event_hub_connection("PREDICTIONS_EVENT_HUB")
+            #     #     # Send prediction results to predictions event hub
+            #     #     event_hub_connection_str, predictions_event_hub = get_event_hub_connection("PREDICTIONS_EVENT_HUB")
                 
-        #     #     if event_hub_connection_str and predictions_event_hub:
-        #     #         producer = EventHubProducerClient.from_connection_string(
-        #     #             conn_str=event_hub_connection_str,
-        #     #             eventhub_name=predictions_event_hub
-        #     #         )
+            #     #     if event_hub_connection_str and predictions_event_hub:
+            #     #         producer = EventHubProducerClient.from_connection_string(
+            #     #             conn_str=event_hub_connection_str,
+            #     #             eventhub_name=predictions_event_hub
+            #     #         )
                     
-        #     #         # Create result payload
-        #     #         result_payload = {
-        #     #             "timestamp": datetime.datetime.now().isoformat(),
-        #     #             "original_label": label,
-        #     #             "prediction": prediction_result,
-        #     #             "image_size_kb": image_size_kb
-        #     #         }
+            #     #         # Create result payload
+            #     #         result_payload = {
+            #     #             "timestamp": datetime.datetime.now().isoformat(),
+            #     #             "original_label": label,
+            #     #             "prediction": prediction_result,
+            #     #             "image_size_kb": image_size_kb
+            #     #         }
                     
-        #     #         # Send to predictions event hub
-        #     #         with producer:
-        #     #             event_data = EventData(json.dumps(result_payload))
-        #     #             producer.send_batch([event_data])
+            #     #         # Send to predictions event hub
+            #     #         with producer:
+            #     #             event_data = EventData(json.dumps(result_payload))
+            #     #             producer.send_batch([event_data])
                         
-        #     #         logging.info(f"✅ Prediction results sent to Event Hub: {result_payload}")
-        #     #     else:
-        #     #         logging.error("Cannot send prediction: Event Hub settings missing")
-        #     # else:
-        #     #     logging.error(f"ML endpoint returned status code: {response.status_code}")
+            #     #         logging.info(f"✅ Prediction results sent to Event Hub: {result_payload}")
+            #     #     else:
+            #     #         logging.error("Cannot send prediction: Event Hub settings missing")
+            #     # else:
+            #     #     logging.error(f"ML endpoint returned status code: {response.status_code}")
                 
-        # except Exception as ml_error:
-        #     logging.error(f"Error calling ML endpoint: {str(ml_error)}")
+            # except Exception as ml_error:
+            #     logging.error(f"Error calling ML endpoint: {str(ml_error)}")
             
     except Exception as e:
         logging.error(f"❌ Error in prediction processing: {str(e)}")
 
+def _datastore_exists(ml_client: MLClient, datastore_name: str, ttl: float = DATASTORE_CACHE_TTL) -> bool:
+    """
+    Check that a datastore exists in the workspace.
+    
+    Uses a single GET instead of listing every datastore, and remembers a positive
+    answer for ttl seconds since datastores almost never change between deploys.
+    
+    Args:
+        ml_client: Azure ML client
+        datastore_name: Name of the datastore to look up
+        ttl: How long a positive answer is cached, in seconds
+        
+    Returns:
+        bool: True if the datastore exists, False otherwise
+    """
+    cache_key = (id(ml_client), datastore_name)
+    checked_at = _DATASTORE_CACHE.get(cache_key)
+    if checked_at is not None and time.monotonic() - checked_at < ttl:
+        return True
+    
+    try:
+        ml_client.datastores.get(datastore_name)
+    except ResourceNotFoundError:
+        return False
+    
+    _DATASTORE_CACHE[cache_key] = time.monotonic()
+    return True
+
+@functools.lru_cache(maxsize=64)
+def _names_for(blob_name):
+    """
+    Derive the Azure ML names used to deploy a model blob
+    
+    Args:
+        blob_name: Name of the blob containing the model (e.g. models/handwriting_model.keras)
+        
+    Returns:
+        tuple: (model file, model version, model name, endpoint name, deployment name)
+    """
+    model_file = os.path.basename(blob_name)
+    model_version = os.path.splitext(model_file)[0]
+    # The endpoint and deployment are static so that traffic moves to each new model
+    return (
+        model_file,
+        model_version,
+        f"handwriting-model-{model_version}",
+        "handwriting-prediction-ep",
+        "handwriting-deployment"
+    )
+
 def deploy_model(blob_name: str, ml_client: MLClient) -> bool:
     """
     Deploy a model from blob storage to Azure ML.
@@ -299,44 +582,52 @@ def deploy_model(blob_name: str, ml_client: MLClient) -> bool:
     """
     try:
         # Get datastore name from config
-        model_datastore = config_manager.get_setting("AZURE_MODEL_DATASTORE_NAME")
+        model_datastore = get_settings().model_datastore
         if not model_datastore:
             logging.error("❌ Model datastore name not configured")
             return False
 
-        # Extract model version from blob name (e.g., handwriting_model.keras -> handwriting_model)
-        model_version = blob_name.split("/")[-1].replace(".keras", "")
-        
-        # Verify the model exists in the datastore
+        # Verify the datastore exists before creating anything, so a rejected deployment
+        # doesn't leave an endpoint or model registration behind
         try:
-            # List datastores to verify access
-            datastores = ml_client.datastores.list()
-            if model_datastore not in [ds.name for ds in datastores]:
+            if not _datastore_exists(ml_client, model_datastore):
                 logging.error(f"❌ Datastore {model_datastore} not found in workspace")
                 return False
             logging.info(f"✅ Found datastore: {model_datastore}")
-        except Exception as e:
-            logging.error(f"❌ Error accessing datastores: {str(e)}")
+        except HttpResponseError as e:
+            logging.error(f"❌ Error accessing datastores: {e.message}")
             return False
 
+        # Derive names from the blob name (e.g., handwriting_model.keras -> handwriting_model)
+        model_file, model_version, model_name, endpoint_name, deployment_name = _names_for(blob_name)
+        
         # Register the model in Azure ML using the correct datastore path
         model = Model(
-            name=f"handwriting-model-{model_version}",
-            path=f"azureml://datastores/{model_datastore}/paths/models/{blob_name.split('/')[-1]}",
+            name=model_name,
+            path=f"azureml://datastores/{model_datastore}/paths/models/{model_file}",
             description=f"Handwriting recognition model {model_version}"
         )
-        registered_model = ml_client.models.create_or_update(model)
-        logging.info(f"✅ Model registered: {registered_model.name} ({registered_model.version})")
         
         # Create or update the endpoint with static endpoint name
-        endpoint_name = "handwriting-prediction-ep"
         endpoint = ManagedOnlineEndpoint(
             name=endpoint_name,
             description="Endpoint for handwriting prediction",
             auth_mode="key"
         )
-        ml_client.online_endpoints.begin_create_or_update(endpoint).wait()
-        logging.info(f"✅ Endpoint created/updated: {endpoint_name}")
+        
+        # The model registration and endpoint creation don't depend on each other, so run
+        # them concurrently and only join before creating the deployment
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            model_future = executor.submit(ml_client.models.create_or_update, model)
+            endpoint_future = executor.submit(
+                lambda: ml_client.online_endpoints.begin_create_or_update(endpoint).result()
+            )
+            
+            registered_model = model_future.result()
+            logging.info(f"✅ Model registered: {registered_model.name} ({registered_model.version})")
+            
+            endpoint_future.result()
+            logging.info(f"✅ Endpoint created/updated: {endpoint_name}")
         
         # Define a valid Azure ML curated environment
         tensorflow_env = Environment(
@@ -344,7 +635,7 @@ def deploy_model(blob_name: str, ml_client: MLClient) -> bool:
             version="latest"
         )
         deployment = ManagedOnlineDeployment(
-            name="handwriting-deployment",
+            name=deployment_name,
             endpoint_name=endpoint_name,
             model=registered_model.id,
             instance_type="Standard_DS3_v2",
@@ -353,65 +644,61 @@ def deploy_model(blob_name: str, ml_client: MLClient) -> bool:
         )
         
         # Deploy the model
-        ml_client.online_deployments.begin_create_or_update(deployment).wait()
+        ml_client.online_deployments.begin_create_or_update(deployment).result()
         
         # Update traffic to point to static deployment
-        endpoint.traffic = {"handwriting-deployment": 100}
-        ml_client.online_endpoints.begin_create_or_update(endpoint).wait()
+        endpoint.traffic = {deployment_name: 100}
+        ml_client.online_endpoints.begin_create_or_update(endpoint).result()
         
         logging.info(f"🚀 Model successfully deployed to {endpoint_name}")
         return True
         
-    except Exception as e:
-        logging.error(f"❌ Model deployment failed: {str(e)}")
+    except ClientAuthenticationError as e:
+        logging.error(f"❌ Model deployment failed, could not authenticate: {e.message}")
+        return False
+    except ResourceNotFoundError as e:
+        logging.error(f"❌ Model deployment failed, resource not found: {e.message}")
+        return False
+    except HttpResponseError as e:
+        # Throttling and transient 5xx responses have already been retried by the SDK pipeline
+        logging.error(f"❌ Model deployment failed with status {e.status_code}: {e.message}")
+        return False
+    except Exception:
+        logging.exception("❌ Model deployment failed")
         return False
 
 #MARK: THIS NEEDS TO BE FIXED as it wont automaticaly trigger, also since its looking for a file and comparing the current model to the one in blob store, maybe once the model has been uploaded delete it
 @app.blob_trigger(arg_name="myblob", path="models/{name}", connection="AZURE_BLOB_STORAGE_CONNECTION_STRING")
-def deploy_latest_model(myblob: func.InputStream):
+async def deploy_latest_model(myblob: func.InputStream):
     """Triggered when a new model is uploaded to Blob Storage and deploys it to Azure ML."""
     logging.info(f"📥 New model detected: {myblob.name}")
     logging.info(f"Model content length: {myblob.length} bytes")
 
     try:
-        ml_client = get_ml_workspace()
+        # The ML SDK is synchronous; run its calls in worker threads so the event loop
+        # stays free for other invocations while the deployment is in progress
+        ml_client = await asyncio.to_thread(get_ml_workspace)
         if not ml_client:
             logging.error("❌ Failed to get ML workspace.")
             return
- 
-        # Get the datastore name from config
-        model_datastore = config_manager.get_setting("AZURE_MODEL_DATASTORE_NAME")
-        if not model_datastore:
-            logging.error("❌ Model datastore name not configured")
-            return
- 
-        # Load model from datastore (uri_file)
-        model_path = f"azureml://datastores/{model_datastore}/paths/models/{myblob.name}"
-        logging.info(f"📥 Fetching model from datastore: {model_path}")
- 
-        # Register the model
-        model = Model(
-            name="digit_recognition_model",
-            path=model_path,
-            type="uri_file",
-            description="Digit recognition model for deployment"
-        )
-        registered_model = ml_client.models.create_or_update(model)
-        logging.info(f"✅ Model registered: {registered_model.name} ({registered_model.version})")
         
-        # Deploy the model
-        if deploy_model(myblob.name, ml_client):
+        # Register and deploy the model; deploy_model registers the blob under the
+        # datastore path and name derived by _names_for
+        if await asyncio.to_thread(deploy_model, myblob.name, ml_client):
             logging.info("✅ Model deployment completed successfully")
         else:
             logging.error("❌ Model deployment failed")
             
-    except Exception as e:
-        logging.error(f"❌ Error in deploy_latest_model: {str(e)}")
-        logging.error(f"Stack trace: {str(e.__traceback__)}")
+    except ClientAuthenticationError as e:
+        logging.error(f"❌ Error in deploy_latest_model, could not authenticate: {e.message}")
+    except HttpResponseError as e:
+        logging.error(f"❌ Error in deploy_latest_model with status {e.status_code}: {e.message}")
+    except Exception:
+        logging.exception("❌ Error in deploy_latest_model")
 
 #curl "http://localhost:7071/api/deploy-model-manual?model=handwriting_model.keras"
 @app.route(route="deploy-model-manual")
-def deploy_model_manual(req: func.HttpRequest) -> func.HttpResponse:
+async def deploy_model_manual(req: func.HttpRequest) -> func.HttpResponse:
     """Manual trigger endpoint for model deployment"""
     try:
         # Get model name from query parameter
@@ -425,7 +712,7 @@ def deploy_model_manual(req: func.HttpRequest) -> func.HttpResponse:
         logging.info(f"🔄 Manual deployment requested for model: {model_name}")
 
         # Get models container details
-        storage_connection_string, container_name = get_blob_storage_connection(for_models=True)
+        storage_connection_string, container_name = await asyncio.to_thread(get_blob_storage_connection, True)
         if not storage_connection_string or not container_name:
             return func.HttpResponse(
                 "Failed to get models container connection details",
@@ -433,26 +720,28 @@ def deploy_model_manual(req: func.HttpRequest) -> func.HttpResponse:
             )
 
         # Verify the model file exists
-        blob_service_client = BlobServiceClient.from_connection_string(storage_connection_string)
+        blob_service_client = _get_blob_service(storage_connection_string)
         container_client = blob_service_client.get_container_client(container_name)
         
-        try:
-            blob_client = container_client.get_blob_client(f"models/{model_name}")
-            properties = blob_client.get_blob_properties()
-            logging.info(f"✅ Found model file: {model_name}, size: {properties.size} bytes")
-        except Exception as e:
+        blob_client = container_client.get_blob_client(f"models/{model_name}")
+        if not await asyncio.to_thread(blob_client.exists):
             return func.HttpResponse(
-                f"Model file not found: {str(e)}",
+                f"Model file not found: models/{model_name}",
                 status_code=404
             )
+        logging.info(f"✅ Found model file: {model_name}")
 
         # Connect to Azure ML
-        credential = DefaultAzureCredential()
-        ml_client = MLClient(credential, subscription_id, resource_group, workspace_name)
+        ml_client = await asyncio.to_thread(get_ml_workspace)
+        if not ml_client:
+            return func.HttpResponse(
+                "Failed to connect to Azure ML workspace",
+                status_code=500
+            )
         logging.info("✅ Connected to Azure ML workspace")
         
         # Deploy the model
-        if deploy_model(model_name, ml_client):
+        if await asyncio.to_thread(deploy_model, model_name, ml_client):
             return func.HttpResponse(
                 "Model deployment completed successfully",
                 status_code=200
@@ -463,8 +752,20 @@ def deploy_model_manual(req: func.HttpRequest) -> func.HttpResponse:
                 status_code=500
             )
             
+    except ClientAuthenticationError as e:
+        logging.error(f"❌ Error in manual deployment, could not authenticate: {e.message}")
+        return func.HttpResponse(
+            "Error deploying model: could not authenticate with Azure",
+            status_code=500
+        )
+    except HttpResponseError as e:
+        logging.error(f"❌ Error in manual deployment with status {e.status_code}: {e.message}")
+        return func.HttpResponse(
+            f"Error deploying model: {e.message}",
+            status_code=502
+        )
     except Exception as e:
-        logging.error(f"❌ Error in manual deployment: {str(e)}")
+        logging.exception("❌ Error in manual deployment")
         return func.HttpResponse(
             f"Error deploying model: {str(e)}",
             status_code=500
@@ -481,12 +782,17 @@ def train_model_on_schedule(mytimer: func.TimerRequest):
 
     try:
         # Load Azure ML Workspace
-        ws = Workspace.from_config()
+        settings = get_settings()
+        ws = _get_training_workspace(
+            settings.ml_subscription_id,
+            settings.ml_resource_group,
+            settings.ml_workspace_name
+        )
 
         # Get the registered experiment
         experiment = Experiment(ws, "train-digits-model")
 
-        # Submit the pipeline run
+        # Submit the pipeline run; this returns once the run is queued, we don't wait on it
         run = experiment.submit("train_model.py")
 
         logging.info(f"✅ Training started successfully: Run ID {run.id}")
@@ -498,6 +804,14 @@ def train_model_on_schedule(mytimer: func.TimerRequest):
 @app.route(route="health")
 def health_check(req: func.HttpRequest) -> func.HttpResponse:
     """Health check endpoint for the Azure Functions"""
+    global _HEALTH_CACHE
+    if _HEALTH_CACHE and time.monotonic() - _HEALTH_CACHE[0] < HEALTH_CACHE_TTL:
+        return func.HttpResponse(
+            _HEALTH_CACHE[1],
+            mimetype="application/json",
+            status_code=200
+        )
+
     try:
         # Check Event Hub connection
         alphabet_connection, alphabet_hub = get_event_hub_connection("ALPHABET_EVENT_HUB")
@@ -526,9 +840,11 @@ def health_check(req: func.HttpRequest) -> func.HttpResponse:
         # Determine overall status
         if not all(health_status["connections"].values()):
             health_status["status"] = "degraded"
-            
+
+        body = _json_dumps(health_status)
+        _HEALTH_CACHE = (time.monotonic(), body)
         return func.HttpResponse(
-            json.dumps(health_status),
+            body,
             mimetype="application/json",
             status_code=200
         )
@@ -539,7 +855,7 @@ def health_check(req: func.HttpRequest) -> func.HttpResponse:
             "timestamp": datetime.datetime.now().isoformat()
         }
         return func.HttpResponse(
-            json.dumps(error_status),
+            _json_dumps(error_status),
             mimetype="application/json",
             status_code=500
         )
@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 import argparse
 import logging
+import signal
+import subprocess
 import sys
 import os
+import threading
 from typing import Optional
 import json
 from config_utils import get_config_manager
@@ -36,17 +39,30 @@ def delete_services() -> None:
         logging.error(f"❌ Error deleting services: {str(e)}")
         sys.exit(1)
 
+def _stop_process(process) -> None:
+    """Send SIGTERM to a service's whole process group (Flask's reloader spawns a child) and wait for it"""
+    if hasattr(os, "killpg"):
+        try:
+            os.killpg(os.getpgid(process.pid), signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    else:
+        process.terminate()
+    process.wait()
+
 def start_services() -> None:
     """Start the Producer and Consumer services"""
     try:
-        import subprocess
-        import time
+        # Set when Ctrl+C/SIGTERM arrives or when either service exits
+        stop_event = threading.Event()
 
         # Start Producer
         producer_process = subprocess.Popen(
             [sys.executable, "Producer.py"],
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+            stderr=subprocess.STDOUT,
+            bufsize=1 << 16,
+            start_new_session=True
         )
         logging.info("✅ Producer service started")
 
@@ -54,37 +70,61 @@ def start_services() -> None:
         consumer_process = subprocess.Popen(
             [sys.executable, "Consumer.py"],
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+            stderr=subprocess.STDOUT,
+            bufsize=1 << 16,
+            start_new_session=True
         )
         logging.info("✅ Consumer service started")
 
+        services = {"Producer": producer_process, "Consumer": consumer_process}
+
+        def watch_service(name, process):
+            # Blocks in the kernel until the child exits
+            process.wait()
+            if not stop_event.is_set():
+                logging.warning(f"{name} service exited with code {process.returncode}")
+            stop_event.set()
+
+        def drain_output(name, process):
+            # Keep reading the pipe so the child never blocks once the OS buffer fills up
+            for line in iter(process.stdout.readline, b""):
+                logging.info(f"[{name}] {line.decode(errors='replace').rstrip()}")
+
+        for name, process in services.items():
+            threading.Thread(target=drain_output, args=(name, process), daemon=True).start()
+            threading.Thread(target=watch_service, args=(name, process), daemon=True).start()
+
+        previous_handlers = {
+            sig: signal.signal(sig, lambda signum, frame: stop_event.set())
+            for sig in (signal.SIGINT, signal.SIGTERM)
+        }
         try:
-            while True:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            logging.info("Stopping services...")
-            producer_process.terminate()
-            consumer_process.terminate()
-            producer_process.wait()
-            consumer_process.wait()
-            logging.info("✅ Services stopped")
+            stop_event.wait()
+        finally:
+            for sig, handler in previous_handlers.items():
+                signal.signal(sig, handler)
+
+        logging.info("Stopping services...")
+        for process in services.values():
+            _stop_process(process)
+        logging.info("✅ Services stopped")
 
     except Exception as e:
         logging.error(f"❌ Error starting services: {str(e)}")
         sys.exit(1)
 
+# Settings written to local.settings.json by provision_services.py
+REQUIRED_SETTINGS = (
+    "AZURE_STORAGE_ACCOUNT",
+    "AZURE_EVENT_HUB_NAMESPACE",
+    "AZURE_FUNCTION_APP",
+    "AZURE_ML_WORKSPACE"
+)
+
 def verify_config() -> None:
     """Verify all required configuration is present"""
     try:
-        config_manager = get_config_manager()
-        required_settings = [
-            "AZURE_STORAGE_ACCOUNT",
-            "AZURE_EVENT_HUB_NAMESPACE",
-            "AZURE_FUNCTION_APP",
-            "AZURE_ML_WORKSPACE"
-        ]
-        
-        missing = config_manager.validate_required_settings(required_settings)
+        missing = get_config_manager().validate_required_settings(REQUIRED_SETTINGS)
         if missing:
             logging.error(f"❌ Missing required settings: {', '.join(missing)}")
             logging.error("Please run provision_services.py to generate these settings")
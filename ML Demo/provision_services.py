@@ -3,18 +3,17 @@ import os
 import time
 import logging
 import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import requests
+from requests.adapters import HTTPAdapter
 from azure.identity import DefaultAzureCredential
+from azure.core.exceptions import HttpResponseError, ResourceNotFoundError
+from azure.core.pipeline.transport import RequestsTransport
 from azure.mgmt.resource import ResourceManagementClient
-from azure.mgmt.storage import StorageManagementClient
-from azure.mgmt.storage.models import StorageAccountCreateParameters, Sku
 from azure.mgmt.eventhub import EventHubManagementClient
-from azure.mgmt.eventhub.models import Eventhub, AccessRights
-from azure.mgmt.authorization import AuthorizationManagementClient
-from azure.mgmt.authorization.models import RoleAssignmentCreateParameters
-from azure.mgmt.web import WebSiteManagementClient
-from azure.ai.ml import MLClient
-from azure.ai.ml.entities import Workspace
-from azure.mgmt.web.models import Site, SiteConfig, NameValuePair
+from azure.mgmt.eventhub.models import Eventhub
 from config_utils import update_ml_workspace_name, get_config_manager
 
 # Configure logging
@@ -32,6 +31,54 @@ def load_config(config_path="config.json"):
         logging.error(f"Error loading config: {str(e)}")
         raise
 
+@dataclass(frozen=True)
+class MLEndpointsConfig:
+    """Regions and paths used to build the ML workspace endpoint URLs"""
+    prediction_region: str
+    prediction_path: str
+    training_region: str
+    training_path: str
+
+@dataclass(frozen=True)
+class SettingsConfig:
+    """Values from config.json that are written to local.settings.json"""
+    ml_endpoints: MLEndpointsConfig
+    ml_model_name: str
+    ml_experiment_name: str
+    form_recognizer_endpoint: str
+    form_recognizer_key: str
+    function_app_runtime: str
+    related_services: frozenset
+
+def load_settings_config(resource_config):
+    """
+    Read the settings-related parts of the resources config once, up front.
+
+    Args:
+        resource_config: The "resources" section of config.json
+
+    Returns:
+        SettingsConfig: Typed view of the values written to local.settings.json
+    """
+    ml_workspace = resource_config["ml_workspace"]
+    endpoints = ml_workspace["endpoints"]
+    return SettingsConfig(
+        ml_endpoints=MLEndpointsConfig(
+            prediction_region=endpoints["prediction"]["region"],
+            prediction_path=endpoints["prediction"]["path"],
+            training_region=endpoints["training"]["region"],
+            training_path=endpoints["training"]["path"]
+        ),
+        ml_model_name=ml_workspace["model_name"],
+        ml_experiment_name=ml_workspace["experiment_name"],
+        form_recognizer_endpoint=resource_config["form_recognizer"]["endpoint"],
+        form_recognizer_key=resource_config["form_recognizer"]["key"],
+        function_app_runtime=resource_config["function_app"]["runtime"],
+        related_services=frozenset(
+            service for service, enabled in resource_config.get("related_services", {}).items() if enabled
+        )
+    )
+
 # Load configuration
 config = load_config()
 azure_config = config["azure"]
@@ -49,27 +96,144 @@ FUNCTION_APP_NAME = resource_config["function_app"]["name"]
 ML_WORKSPACE_NAME = resource_config["ml_workspace"]["name"]
 BLOB_CONTAINER_NAME = resource_config.get("blob_container", "azureml-blobstore")
 USE_ML_WORKSPACE_STORAGE = resource_config.get("use_ml_workspace_storage", True)
+SETTINGS_CONFIG = load_settings_config(resource_config)
+
+# Related services are named from the resource prefix and the Function App name
+PREFIX = resource_config.get("prefix", "handwrit")
+FA_SUFFIX = FUNCTION_APP_NAME.lower()[:8]
+APP_INSIGHTS_NAME = f"{PREFIX}insights{FA_SUFFIX}"
+LOG_ANALYTICS_NAME = f"{PREFIX}logalytic{FA_SUFFIX}"
+KEY_VAULT_NAME = f"{PREFIX}keyvault{FA_SUFFIX}"
+
+# Poll long-running operations every 5 seconds instead of the SDK default of up to
+# 30; most of these resources are ready well before the first default poll
+LRO_POLLING_INTERVAL = 5
+
+# How long to wait for the ML workspace creation LRO
+WORKSPACE_CREATE_TIMEOUT = 600
+
+# Readiness checks back off exponentially up to this delay, and give up at the deadline
+MAX_BACKOFF_SECONDS = 30
+WAIT_DEADLINE_SECONDS = 300
+
+class CachedTokenCredential:
+    """
+    Credential wrapper that shares tokens across all management clients.
+
+    Each client otherwise asks the credential chain for its own token, and when that
+    resolves to the Azure CLI every request shells out to `az account get-access-token`.
+    """
+
+    def __init__(self, credential, refresh_margin=300):
+        """
+        Args:
+            credential: The credential to fetch tokens from
+            refresh_margin: Seconds before expiry at which a cached token is refreshed
+        """
+        self._credential = credential
+        self._refresh_margin = refresh_margin
+        self._tokens = {}
+        self._lock = threading.Lock()
+
+    def get_token(self, *scopes, **kwargs):
+        # Claims challenges must always go to the underlying credential
+        if kwargs.get("claims"):
+            return self._credential.get_token(*scopes, **kwargs)
+
+        key = (scopes, kwargs.get("tenant_id"))
+        with self._lock:
+            token = self._tokens.get(key)
+            if token is None or token.expires_on - self._refresh_margin < time.time():
+                token = self._credential.get_token(*scopes, **kwargs)
+                self._tokens[key] = token
+            return token
+
+    def close(self):
+        self._credential.close()
 
 # Authenticate with Azure
 try:
-    credential = DefaultAzureCredential()
-    resource_client = ResourceManagementClient(credential, SUBSCRIPTION_ID)
+    # Provisioning runs from a developer machine (Azure CLI) or with a managed
+    # identity, so skip probing the other sources in the chain
+    credential = CachedTokenCredential(DefaultAzureCredential(
+        exclude_interactive_browser_credential=True,
+        exclude_visual_studio_code_credential=True,
+        exclude_shared_token_cache_credential=True,
+        exclude_powershell_credential=True
+    ))
+
+    # One pooled transport for every client, so calls to management.azure.com reuse
+    # keep-alive connections instead of each client opening its own
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    transport = RequestsTransport(session=session, session_owner=False)
+
+    resource_client = ResourceManagementClient(credential, SUBSCRIPTION_ID, transport=transport)
+    eventhub_client = EventHubManagementClient(credential, SUBSCRIPTION_ID, transport=transport)
     logging.info("Successfully authenticated with Azure")
 except Exception as e:
     logging.error(f"Authentication failed: {str(e)}")
     raise
 
-# Check if Resource Group Exists
-logging.info("🔹 Checking if Resource Group exists...")
+def resource_group_exists():
+    """Check whether the Resource Group already exists with a single HEAD request"""
+    return resource_client.resource_groups.check_existence(RESOURCE_GROUP)
+
+def list_existing_resources():
+    """
+    List everything in the Resource Group once so the existence checks below
+    don't each need their own ARM round trip
+
+    This reads ARM directly rather than querying Azure Resource Graph, whose index
+    can lag behind resources created moments earlier (e.g. by a previous run)
+
+    Returns:
+        set: (lowercased resource type, lowercased name) for every resource in the group
+    """
+    try:
+        return {
+            (resource.type.lower(), resource.name.lower())
+            for resource in resource_client.resources.list_by_resource_group(RESOURCE_GROUP)
+        }
+    except ResourceNotFoundError:
+        # The Resource Group doesn't exist yet, so neither does anything in it
+        return set()
+
+def list_existing_event_hubs():
+    """
+    List the Event Hubs in the namespace; they are child resources, so the
+    Resource Group listing doesn't include them
+
+    Returns:
+        set: Names of the existing Event Hubs
+    """
+    try:
+        return {eh.name for eh in eventhub_client.event_hubs.list_by_namespace(RESOURCE_GROUP, EVENT_HUB_NAMESPACE)}
+    except ResourceNotFoundError:
+        # The namespace (or its Resource Group) doesn't exist yet
+        return set()
+
+# The existence checks don't depend on each other, so run them concurrently
+logging.info("🔹 Checking for existing resources...")
+try:
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        rg_exists_future = executor.submit(resource_group_exists)
+        existing_resources_future = executor.submit(list_existing_resources)
+        existing_event_hubs_future = executor.submit(list_existing_event_hubs)
+
+    rg_exists = rg_exists_future.result()
+    EXISTING_RESOURCES = existing_resources_future.result()
+    EXISTING_EVENT_HUBS = existing_event_hubs_future.result()
+    logging.info(f"✅ Found {len(EXISTING_RESOURCES)} existing resources in '{RESOURCE_GROUP}'.")
+except Exception as e:
+    logging.error(f"Error checking existing resources: {str(e)}")
+    raise
+
+# Create the Resource Group if needed
 try:
-    rg_exists = False
-    for rg in resource_client.resource_groups.list():
-        if rg.name == RESOURCE_GROUP:
-            rg_exists = True
-            logging.info(f"✅ Resource Group '{RESOURCE_GROUP}' already exists.")
-            break
-
-    if not rg_exists:
+    if rg_exists:
+        logging.info(f"✅ Resource Group '{RESOURCE_GROUP}' already exists.")
+    else:
         logging.info("🔹 Creating Resource Group...")
         resource_client.resource_groups.create_or_update(RESOURCE_GROUP, {"location": LOCATION})
         logging.info(f"✅ Resource Group '{RESOURCE_GROUP}' created.")
@@ -77,441 +241,486 @@ except Exception as e:
     logging.error(f"Error managing Resource Group: {str(e)}")
     raise
 
-# Check if Event Hub Namespace exists
-try:
-    eventhub_client = EventHubManagementClient(credential, SUBSCRIPTION_ID)
-    logging.info("🔹 Checking if Event Hub Namespace exists...")
-    eventhub_namespace_exists = any(ns.name == EVENT_HUB_NAMESPACE for ns in eventhub_client.namespaces.list_by_resource_group(RESOURCE_GROUP))
+def backoff_delay(attempt, error=None):
+    """
+    Get how long to wait before the next readiness check.
 
-    if eventhub_namespace_exists:
-        logging.info(f"✅ Event Hub Namespace '{EVENT_HUB_NAMESPACE}' already exists.")
-    else:
-        logging.info("🔹 Creating Event Hub Namespace...")
-        eventhub_client.namespaces.begin_create_or_update(RESOURCE_GROUP, EVENT_HUB_NAMESPACE, {"location": LOCATION}).result()
-        logging.info(f"✅ Event Hub Namespace '{EVENT_HUB_NAMESPACE}' created.")
-    
-    # Enable system-assigned managed identity for Event Hub Namespace
-    logging.info("🔹 Enabling system-assigned managed identity for Event Hub Namespace...")
-    eventhub_namespace = eventhub_client.namespaces.get(RESOURCE_GROUP, EVENT_HUB_NAMESPACE)
-    identity_params = {
-        "location": eventhub_namespace.location,
-        "identity": {
-            "type": "SystemAssigned"
+    Args:
+        attempt: Number of checks made so far
+        error: Exception raised by the last check, if any
+
+    Returns:
+        int: Seconds to wait; the service's Retry-After if it sent one, otherwise
+        exponential backoff capped at MAX_BACKOFF_SECONDS
+    """
+    response = getattr(error, "response", None)
+    if response is not None:
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return int(retry_after)
+        if response.status_code == 429:
+            # Throttled without a hint, back off as far as we allow
+            return MAX_BACKOFF_SECONDS
+    return min(MAX_BACKOFF_SECONDS, 2 ** attempt)
+
+def create_datastore(ml_client, datastore):
+    """
+    Create a datastore, retrying while the new workspace still rejects the request
+
+    Args:
+        ml_client: MLClient for the workspace
+        datastore: Datastore entity to create
+
+    Returns:
+        The created datastore
+    """
+    deadline = time.monotonic() + WAIT_DEADLINE_SECONDS
+    attempt = 0
+    while True:
+        try:
+            return ml_client.datastores.create_or_update(datastore)
+        except HttpResponseError as e:
+            # Only not-found, conflict, throttling and server errors can clear up on their own
+            status = e.status_code or 0
+            retry_delay = backoff_delay(attempt, e)
+            if (status not in (404, 409, 429) and status < 500) or time.monotonic() + retry_delay > deadline:
+                raise
+            logging.warning(f"Workspace not ready for datastore '{datastore.name}' (attempt {attempt + 1}). Waiting {retry_delay} seconds...")
+            time.sleep(retry_delay)
+            attempt += 1
+
+def resource_exists(resource_type, resource_name):
+    """
+    Check whether a resource was in the Resource Group when provisioning started
+
+    Args:
+        resource_type: ARM resource type, e.g. "Microsoft.Web/sites"
+        resource_name: Name of the resource
+
+    Returns:
+        bool: True if the resource already exists
+    """
+    return (resource_type.lower(), resource_name.lower()) in EXISTING_RESOURCES
+
+def provision_event_hubs():
+    """
+    Provision the Event Hub Namespace and its Event Hubs
+
+    Returns:
+        str: Connection string for the Event Hub Namespace
+    """
+    # Check if Event Hub Namespace exists
+    try:
+        logging.info("🔹 Checking if Event Hub Namespace exists...")
+        eventhub_namespace_exists = resource_exists("Microsoft.EventHub/namespaces", EVENT_HUB_NAMESPACE)
+
+        # Create the namespace with its system-assigned managed identity in a single
+        # PUT; for an existing namespace this just enables the identity
+        namespace_location = LOCATION
+        if eventhub_namespace_exists:
+            logging.info(f"✅ Event Hub Namespace '{EVENT_HUB_NAMESPACE}' already exists.")
+            # Keep the existing namespace's region; a PUT with a different one fails
+            namespace_location = eventhub_client.namespaces.get(RESOURCE_GROUP, EVENT_HUB_NAMESPACE).location
+            logging.info("🔹 Enabling system-assigned managed identity for Event Hub Namespace...")
+        else:
+            logging.info("🔹 Creating Event Hub Namespace with system-assigned managed identity...")
+        namespace_params = {
+            "location": namespace_location,
+            "identity": {
+                "type": "SystemAssigned"
+            }
         }
-    }
-    eventhub_namespace = eventhub_client.namespaces.begin_create_or_update(
-        RESOURCE_GROUP, 
-        EVENT_HUB_NAMESPACE, 
-        identity_params
-    ).result()
-    logging.info("✅ Event Hub Namespace setup complete")
-except Exception as e:
-    logging.error(f"Error managing Event Hub Namespace: {str(e)}")
-    raise
+        eventhub_client.namespaces.begin_create_or_update(
+            RESOURCE_GROUP,
+            EVENT_HUB_NAMESPACE,
+            namespace_params,
+            polling_interval=LRO_POLLING_INTERVAL
+        ).result()
+        logging.info("✅ Event Hub Namespace setup complete")
+    except Exception as e:
+        logging.error(f"Error managing Event Hub Namespace: {str(e)}")
+        raise
 
-# Check if Event Hubs exist
-try:
-    logging.info("🔹 Checking if Event Hubs exist...")
-    existing_event_hubs = {eh.name for eh in eventhub_client.event_hubs.list_by_namespace(RESOURCE_GROUP, EVENT_HUB_NAMESPACE)}
+    # Check if Event Hubs exist
+    try:
+        logging.info("🔹 Checking if Event Hubs exist...")
+        if ALPHABET_EVENT_HUB in EXISTING_EVENT_HUBS:
+            logging.info(f"✅ Event Hub '{ALPHABET_EVENT_HUB}' already exists.")
+        else:
+            logging.info(f"🔹 Creating Event Hub '{ALPHABET_EVENT_HUB}'...")
+            # Create Event Hub and its consumer groups
+            eventhub_client.event_hubs.create_or_update(RESOURCE_GROUP, EVENT_HUB_NAMESPACE, ALPHABET_EVENT_HUB, Eventhub())
+            logging.info(f"✅ Event Hub '{ALPHABET_EVENT_HUB}' created.")
+        
+            # Create consumer groups for alphabet topic
+            for purpose, group_name in ALPHABET_CONSUMER_GROUPS.items():
+                try:
+                    eventhub_client.consumer_groups.create_or_update(
+                        RESOURCE_GROUP,
+                        EVENT_HUB_NAMESPACE,
+                        ALPHABET_EVENT_HUB,
+                        group_name,
+                        {}
+                    )
+                    logging.info(f"✅ Consumer group '{group_name}' created for purpose: {purpose}")
+                except Exception as consumer_group_error:
+                    logging.error(f"Error creating consumer group '{group_name}': {str(consumer_group_error)}")
 
-    if ALPHABET_EVENT_HUB in existing_event_hubs:
-        logging.info(f"✅ Event Hub '{ALPHABET_EVENT_HUB}' already exists.")
-    else:
-        logging.info(f"🔹 Creating Event Hub '{ALPHABET_EVENT_HUB}'...")
-        # Create Event Hub and its consumer groups
-        eventhub_client.event_hubs.create_or_update(RESOURCE_GROUP, EVENT_HUB_NAMESPACE, ALPHABET_EVENT_HUB, Eventhub())
-        logging.info(f"✅ Event Hub '{ALPHABET_EVENT_HUB}' created.")
-        
-        # Create consumer groups for alphabet topic
-        for purpose, group_name in ALPHABET_CONSUMER_GROUPS.items():
-            try:
-                eventhub_client.consumer_groups.create_or_update(
-                    RESOURCE_GROUP,
-                    EVENT_HUB_NAMESPACE,
-                    ALPHABET_EVENT_HUB,
-                    group_name,
-                    {}
-                )
-                logging.info(f"✅ Consumer group '{group_name}' created for purpose: {purpose}")
-            except Exception as consumer_group_error:
-                logging.error(f"Error creating consumer group '{group_name}': {str(consumer_group_error)}")
-
-    if PREDICTIONS_EVENT_HUB in existing_event_hubs:
-        logging.info(f"✅ Event Hub '{PREDICTIONS_EVENT_HUB}' already exists.")
-    else:
-        logging.info(f"🔹 Creating Event Hub '{PREDICTIONS_EVENT_HUB}'...")
-        eventhub_client.event_hubs.create_or_update(RESOURCE_GROUP, EVENT_HUB_NAMESPACE, PREDICTIONS_EVENT_HUB, Eventhub())
-        logging.info(f"✅ Event Hub '{PREDICTIONS_EVENT_HUB}' created.")
-except Exception as e:
-    logging.error(f"Error managing Event Hubs: {str(e)}")
-    raise
+        if PREDICTIONS_EVENT_HUB in EXISTING_EVENT_HUBS:
+            logging.info(f"✅ Event Hub '{PREDICTIONS_EVENT_HUB}' already exists.")
+        else:
+            logging.info(f"🔹 Creating Event Hub '{PREDICTIONS_EVENT_HUB}'...")
+            eventhub_client.event_hubs.create_or_update(RESOURCE_GROUP, EVENT_HUB_NAMESPACE, PREDICTIONS_EVENT_HUB, Eventhub())
+            logging.info(f"✅ Event Hub '{PREDICTIONS_EVENT_HUB}' created.")
+    except Exception as e:
+        logging.error(f"Error managing Event Hubs: {str(e)}")
+        raise
 
-# Get Event Hub Connection String
-try:
-    eventhub_keys = eventhub_client.namespaces.list_keys(RESOURCE_GROUP, EVENT_HUB_NAMESPACE, "RootManageSharedAccessKey")
-    EVENT_HUB_CONNECTION_STRING = eventhub_keys.primary_connection_string
-    logging.info("✅ Retrieved Event Hub connection string.")
-except Exception as e:
-    logging.error(f"Error retrieving Event Hub connection string: {str(e)}")
-    raise
+    # Get Event Hub Connection String
+    try:
+        eventhub_keys = eventhub_client.namespaces.list_keys(RESOURCE_GROUP, EVENT_HUB_NAMESPACE, "RootManageSharedAccessKey")
+        event_hub_connection_string = eventhub_keys.primary_connection_string
+        logging.info("✅ Retrieved Event Hub connection string.")
+    except Exception as e:
+        logging.error(f"Error retrieving Event Hub connection string: {str(e)}")
+        raise
 
-# Check if Azure ML Workspace exists
-try:
-    logging.info("🔹 Checking if Azure ML Workspace exists...")
-    ml_client = MLClient(credential, SUBSCRIPTION_ID, RESOURCE_GROUP)
-    ml_workspaces = {ws.name for ws in ml_client.workspaces.list()}
+    return event_hub_connection_string
 
-    # Generate a new unique name for the workspace
-    ML_WORKSPACE_NAME = update_ml_workspace_name()
-    logging.info(f"Using ML workspace name: {ML_WORKSPACE_NAME}")
-    
-    # Create the workspace with the new name
+def provision_ml_workspace():
+    """
+    Provision a new Azure ML Workspace and the datastores on its storage account
+
+    Returns:
+        tuple: (workspace name, storage account name, storage key, storage connection string)
+    """
+    # The ML and storage SDKs are heavy to import, so load them only in this step
+    from azure.ai.ml import MLClient
+    from azure.ai.ml.entities import Workspace
+    from azure.mgmt.storage import StorageManagementClient
+
+    # Create a new Azure ML Workspace
     try:
-        logging.info(f"🔹 Creating Azure ML Workspace '{ML_WORKSPACE_NAME}'...")
-        workspace = Workspace(location=LOCATION, name=ML_WORKSPACE_NAME, resource_group=RESOURCE_GROUP)
-        ml_client.workspaces.begin_create(workspace).result()
-        logging.info(f"✅ Azure ML Workspace '{ML_WORKSPACE_NAME}' created.")
-        
-        # Wait for ML workspace to be fully provisioned with storage account
-        logging.info("🔹 Waiting for ML workspace to be fully provisioned...")
-        max_retries = 10
-        retry_delay = 30  # seconds
-        workspace_details = None
-        storage_account_id = None
-        
-        for attempt in range(max_retries):
-            try:
-                workspace_details = ml_client.workspaces.get(ML_WORKSPACE_NAME)
-                if hasattr(workspace_details, 'storage_account') and workspace_details.storage_account:
-                    storage_account_id = workspace_details.storage_account
-                    logging.info(f"Found ML workspace storage account ID: {storage_account_id}")
-                    break
-                logging.info(f"Storage account not ready in workspace, attempt {attempt + 1}/{max_retries}. Waiting {retry_delay} seconds...")
-                time.sleep(retry_delay)
-            except Exception as e:
-                logging.warning(f"Error getting workspace details (attempt {attempt + 1}): {str(e)}")
-                time.sleep(retry_delay)
+        logging.info("🔹 Provisioning Azure ML Workspace...")
+        ml_client = MLClient(credential, SUBSCRIPTION_ID, RESOURCE_GROUP, transport=transport)
+
+        # Generate a new unique name for the workspace
+        workspace_name = update_ml_workspace_name()
+        logging.info(f"Using ML workspace name: {workspace_name}")
+    
+        # Create the workspace with the new name
+        try:
+            logging.info(f"🔹 Creating Azure ML Workspace '{workspace_name}'...")
+            workspace = Workspace(location=LOCATION, name=workspace_name, resource_group=RESOURCE_GROUP)
+            workspace_poller = ml_client.workspaces.begin_create(workspace)
+        
+            # Let the poller follow the operation status (and its Retry-After) until the
+            # workspace has finished provisioning, rather than re-reading it on a timer
+            logging.info("🔹 Waiting for ML workspace to be fully provisioned...")
+            workspace_poller.wait(timeout=WORKSPACE_CREATE_TIMEOUT)
+            if not workspace_poller.done():
+                raise Exception(f"ML workspace '{workspace_name}' was not created within {WORKSPACE_CREATE_TIMEOUT} seconds")
+            workspace_details = workspace_poller.result()
+            logging.info(f"✅ Azure ML Workspace '{workspace_name}' created.")
+        
+            # The created workspace normally already references its storage account; only
+            # poll for it if it hasn't been attached yet
+            storage_account_id = getattr(workspace_details, "storage_account", None)
+            deadline = time.monotonic() + WAIT_DEADLINE_SECONDS
+            attempt = 0
+        
+            while not storage_account_id and time.monotonic() < deadline:
+                try:
+                    workspace_details = ml_client.workspaces.get(workspace_name)
+                    if hasattr(workspace_details, 'storage_account') and workspace_details.storage_account:
+                        storage_account_id = workspace_details.storage_account
+                        logging.info(f"Found ML workspace storage account ID: {storage_account_id}")
+                        break
+                    retry_delay = backoff_delay(attempt)
+                    logging.info(f"Storage account not ready in workspace, attempt {attempt + 1}. Waiting {retry_delay} seconds...")
+                except Exception as e:
+                    retry_delay = backoff_delay(attempt, e)
+                    logging.warning(f"Error getting workspace details (attempt {attempt + 1}): {str(e)}")
+                time.sleep(min(retry_delay, max(0, deadline - time.monotonic())))
+                attempt += 1
+        
+            if not workspace_details or not storage_account_id:
+                raise Exception("Could not get ML workspace storage account details")
+        
+            # Get the storage account details
+            logging.info("🔹 Getting storage account details...")
+            storage_client = StorageManagementClient(credential, SUBSCRIPTION_ID, transport=transport)
+        
+            # Extract storage account name from resource ID
+            storage_account_name = storage_account_id.split('/')[-1]
+        
+            # The storage account is created as part of the workspace, so it has finished
+            # provisioning once begin_create has completed; fetch its keys exactly once
+            storage_keys = storage_client.storage_accounts.list_keys(
+                RESOURCE_GROUP,
+                storage_account_name
+            )
+            storage_key = storage_keys.keys[0].value
+            storage_connection_string = f"DefaultEndpointsProtocol=https;AccountName={storage_account_name};AccountKey={storage_key};EndpointSuffix=core.windows.net"
+            logging.info(f"✅ Retrieved ML workspace storage account details: {storage_account_name}")
         
-        if not workspace_details or not storage_account_id:
-            raise Exception("Could not get ML workspace storage account details")
+            # Update blob container name in config files
+            from config_utils import update_blob_container_name
+            update_blob_container_name(BLOB_CONTAINER_NAME)
+            logging.info(f"✅ Updated blob container name in configuration files: {BLOB_CONTAINER_NAME}")
         
-        # Get the storage account details
-        logging.info("🔹 Getting storage account details...")
-        storage_client = StorageManagementClient(credential, SUBSCRIPTION_ID)
+            # Provision datastores for ML workspace
+            logging.info("🔹 Provisioning datastores for ML workspace...")
         
-        # Extract storage account name from resource ID
-        storage_account_name = storage_account_id.split('/')[-1]
+            # Define datastore names
+            TRAINING_DATASTORE_NAME = "digit_image_store"
+            MODEL_DATASTORE_NAME = "prediction_model_store"
         
-        # Wait for storage account to be fully provisioned
-        provisioning_retries = 5
-        retry_delay = 10  # seconds
-        storage_account = None
+            # Create ML client for the specific workspace
+            ml_client = MLClient(credential, SUBSCRIPTION_ID, RESOURCE_GROUP, workspace_name, transport=transport)
         
-        for attempt in range(provisioning_retries):
+            # Create training data datastore
             try:
-                storage_account = storage_client.storage_accounts.get_properties(
-                    RESOURCE_GROUP,
-                    storage_account_name
-                )
-                if storage_account.provisioning_state == "Succeeded":
-                    logging.info(f"Storage account {storage_account_name} is fully provisioned")
-                    break
-                logging.info(f"Waiting for storage account provisioning... Current state: {storage_account.provisioning_state}")
-                time.sleep(retry_delay)
-            except Exception as e:
-                logging.warning(f"Error checking storage account provisioning (attempt {attempt + 1}): {str(e)}")
-                time.sleep(retry_delay)
-        
-        if not storage_account:
-            raise Exception("Could not get storage account properties")
-        
-        # Get storage account keys
-        storage_keys = storage_client.storage_accounts.list_keys(
-            RESOURCE_GROUP,
-            storage_account_name
-        )
-        STORAGE_KEY = storage_keys.keys[0].value
-        STORAGE_CONNECTION_STRING = f"DefaultEndpointsProtocol=https;AccountName={storage_account_name};AccountKey={STORAGE_KEY};EndpointSuffix=core.windows.net"
-        STORAGE_ACCOUNT_NAME = storage_account_name
-        logging.info(f"✅ Retrieved ML workspace storage account details: {STORAGE_ACCOUNT_NAME}")
-        
-        # Update blob container name in config files
-        from config_utils import update_blob_container_name
-        update_blob_container_name(BLOB_CONTAINER_NAME)
-        logging.info(f"✅ Updated blob container name in configuration files: {BLOB_CONTAINER_NAME}")
-        
-        # Provision datastores for ML workspace
-        logging.info("🔹 Provisioning datastores for ML workspace...")
-        
-        # Define datastore names
-        TRAINING_DATASTORE_NAME = "digit_image_store"
-        MODEL_DATASTORE_NAME = "prediction_model_store"
-        
-        # Create ML client for the specific workspace
-        ml_client = MLClient(credential, SUBSCRIPTION_ID, RESOURCE_GROUP, ML_WORKSPACE_NAME)
-        
-        # Wait for ML workspace to be fully ready
-        logging.info("🔹 Waiting for ML workspace to be fully ready for datastore creation...")
-        time.sleep(30)  # Give some time for the workspace to be fully provisioned
-        
-        # Create training data datastore
-        try:
-            from azure.ai.ml.entities import AzureBlobDatastore
-            from azure.core.exceptions import ResourceNotFoundError
+                from azure.ai.ml.entities import AzureBlobDatastore
             
-            # Check if training datastore exists
-            try:
-                training_datastore = ml_client.datastores.get(TRAINING_DATASTORE_NAME)
-                logging.info(f"✅ Training datastore '{TRAINING_DATASTORE_NAME}' already exists.")
-            except ResourceNotFoundError:
-                # Create training datastore
-                logging.info(f"🔹 Creating training datastore '{TRAINING_DATASTORE_NAME}'...")
-                training_datastore = AzureBlobDatastore(
-                    name=TRAINING_DATASTORE_NAME,
-                    description="Datastore for digit training images",
-                    account_name=STORAGE_ACCOUNT_NAME,
-                    container_name=BLOB_CONTAINER_NAME,
-                    credentials={
-                        "account_key": STORAGE_KEY
-                    }
-                )
-                ml_client.datastores.create_or_update(training_datastore)
-                logging.info(f"✅ Training datastore '{TRAINING_DATASTORE_NAME}' created.")
+                # Check if training datastore exists
+                try:
+                    training_datastore = ml_client.datastores.get(TRAINING_DATASTORE_NAME)
+                    logging.info(f"✅ Training datastore '{TRAINING_DATASTORE_NAME}' already exists.")
+                except ResourceNotFoundError:
+                    # Create training datastore
+                    logging.info(f"🔹 Creating training datastore '{TRAINING_DATASTORE_NAME}'...")
+                    training_datastore = AzureBlobDatastore(
+                        name=TRAINING_DATASTORE_NAME,
+                        description="Datastore for digit training images",
+                        account_name=storage_account_name,
+                        container_name=BLOB_CONTAINER_NAME,
+                        credentials={
+                            "account_key": storage_key
+                        }
+                    )
+                    create_datastore(ml_client, training_datastore)
+                    logging.info(f"✅ Training datastore '{TRAINING_DATASTORE_NAME}' created.")
             
-            # Create models container if it doesn't exist
-            MODELS_CONTAINER_NAME = "azureml"
-            try:
-                # Check if models container exists
-                storage_client = StorageManagementClient(credential, SUBSCRIPTION_ID)
-                blob_service = storage_client.blob_containers
+                # Create models container if it doesn't exist
+                MODELS_CONTAINER_NAME = "azureml"
+                try:
+                    # Check if models container exists
+                    blob_service = storage_client.blob_containers
                 
-                # List containers to check if models container exists
-                containers = blob_service.list(RESOURCE_GROUP, STORAGE_ACCOUNT_NAME)
-                models_container_exists = any(container.name == MODELS_CONTAINER_NAME for container in containers)
+                    # List containers to check if models container exists
+                    containers = blob_service.list(RESOURCE_GROUP, storage_account_name)
+                    models_container_exists = any(container.name == MODELS_CONTAINER_NAME for container in containers)
                 
-                if not models_container_exists:
-                    logging.info(f"🔹 Creating models container '{MODELS_CONTAINER_NAME}'...")
-                    blob_service.create(RESOURCE_GROUP, STORAGE_ACCOUNT_NAME, MODELS_CONTAINER_NAME, {})
-                    logging.info(f"✅ Models container '{MODELS_CONTAINER_NAME}' created.")
-                else:
-                    logging.info(f"✅ Models container '{MODELS_CONTAINER_NAME}' already exists.")
-            except Exception as container_error:
-                logging.error(f"Error managing models container: {str(container_error)}")
-                # Continue anyway as this is not critical
-            
-            # Check if model datastore exists
-            try:
-                model_datastore = ml_client.datastores.get(MODEL_DATASTORE_NAME)
-                logging.info(f"✅ Model datastore '{MODEL_DATASTORE_NAME}' already exists.")
-            except ResourceNotFoundError:
-                # Create model datastore
-                logging.info(f"🔹 Creating model datastore '{MODEL_DATASTORE_NAME}'...")
-                model_datastore = AzureBlobDatastore(
-                    name=MODEL_DATASTORE_NAME,
-                    description="Datastore for prediction models",
-                    account_name=STORAGE_ACCOUNT_NAME,
-                    container_name=MODELS_CONTAINER_NAME,
-                    credentials={
-                        "account_key": STORAGE_KEY
-                    }
-                )
-                ml_client.datastores.create_or_update(model_datastore)
-                logging.info(f"✅ Model datastore '{MODEL_DATASTORE_NAME}' created.")
+                    if not models_container_exists:
+                        logging.info(f"🔹 Creating models container '{MODELS_CONTAINER_NAME}'...")
+                        blob_service.create(RESOURCE_GROUP, storage_account_name, MODELS_CONTAINER_NAME, {})
+                        logging.info(f"✅ Models container '{MODELS_CONTAINER_NAME}' created.")
+                    else:
+                        logging.info(f"✅ Models container '{MODELS_CONTAINER_NAME}' already exists.")
+                except Exception as container_error:
+                    logging.error(f"Error managing models container: {str(container_error)}")
+                    # Continue anyway as this is not critical
             
-            # Update config with datastore names
-            from config_utils import update_blob_container_name
-            update_blob_container_name(MODELS_CONTAINER_NAME, is_models_container=True)
-            logging.info(f"✅ Updated models container name in configuration files: {MODELS_CONTAINER_NAME}")
+                # Check if model datastore exists
+                try:
+                    model_datastore = ml_client.datastores.get(MODEL_DATASTORE_NAME)
+                    logging.info(f"✅ Model datastore '{MODEL_DATASTORE_NAME}' already exists.")
+                except ResourceNotFoundError:
+                    # Create model datastore
+                    logging.info(f"🔹 Creating model datastore '{MODEL_DATASTORE_NAME}'...")
+                    model_datastore = AzureBlobDatastore(
+                        name=MODEL_DATASTORE_NAME,
+                        description="Datastore for prediction models",
+                        account_name=storage_account_name,
+                        container_name=MODELS_CONTAINER_NAME,
+                        credentials={
+                            "account_key": storage_key
+                        }
+                    )
+                    create_datastore(ml_client, model_datastore)
+                    logging.info(f"✅ Model datastore '{MODEL_DATASTORE_NAME}' created.")
             
-        except Exception as datastore_error:
-            logging.error(f"Error provisioning datastores: {str(datastore_error)}")
-            # Continue anyway as this is not critical for the basic setup
+                # Update config with datastore names
+                from config_utils import update_blob_container_name
+                update_blob_container_name(MODELS_CONTAINER_NAME, is_models_container=True)
+                logging.info(f"✅ Updated models container name in configuration files: {MODELS_CONTAINER_NAME}")
             
-    except Exception as creation_error:
-        logging.error(f"Failed to create ML workspace: {str(creation_error)}")
+            except Exception as datastore_error:
+                logging.error(f"Error provisioning datastores: {str(datastore_error)}")
+                # Continue anyway as this is not critical for the basic setup
+
+            return workspace_name, storage_account_name, storage_key, storage_connection_string
+        except Exception as creation_error:
+            logging.error(f"Failed to create ML workspace: {str(creation_error)}")
+            raise
+    except Exception as e:
+        logging.error(f"Error managing Azure ML Workspace: {str(e)}")
         raise
-except Exception as e:
-    logging.error(f"Error managing Azure ML Workspace: {str(e)}")
-    raise
 
-# Check if Azure Function App exists
-try:
-    function_client = WebSiteManagementClient(credential, SUBSCRIPTION_ID)
-    logging.info("🔹 Checking if Azure Function App exists...")
-    function_apps = {fa.name for fa in function_client.web_apps.list_by_resource_group(RESOURCE_GROUP)}
+def provision_function_app(storage_connection_string):
+    """
+    Provision the Azure Function App on the ML workspace storage account
 
-    if FUNCTION_APP_NAME in function_apps:
-        logging.info(f"✅ Azure Function App '{FUNCTION_APP_NAME}' already exists.")
-    else:
-        logging.info("🔹 Creating Azure Function App...")
-        # Configure app settings to use the existing storage account
-        site_config = SiteConfig(
-            app_settings=[
-                NameValuePair(
-                    name="AzureWebJobsStorage",
-                    value=STORAGE_CONNECTION_STRING
-                ),
-                NameValuePair(
-                    name="FUNCTIONS_WORKER_RUNTIME",
-                    value="python"
-                ),
-                # Add any other settings here, e.g.:
-                # NameValuePair(name="SETTING_KEY", value="SETTING_VALUE"),
-            ]
-        )
+    Args:
+        storage_connection_string: Connection string used for AzureWebJobsStorage
+    """
+    # Check if Azure Function App exists
+    try:
+        logging.info("🔹 Checking if Azure Function App exists...")
+
+        if resource_exists("Microsoft.Web/sites", FUNCTION_APP_NAME):
+            logging.info(f"✅ Azure Function App '{FUNCTION_APP_NAME}' already exists.")
+        else:
+            # The Web SDK is only needed to create the Function App
+            from azure.mgmt.web import WebSiteManagementClient
+            from azure.mgmt.web.models import Site, SiteConfig, NameValuePair
+            function_client = WebSiteManagementClient(credential, SUBSCRIPTION_ID, transport=transport)
+
+            logging.info("🔹 Creating Azure Function App...")
+            # Configure app settings to use the existing storage account
+            site_config = SiteConfig(
+                app_settings=[
+                    NameValuePair(
+                        name="AzureWebJobsStorage",
+                        value=storage_connection_string
+                    ),
+                    NameValuePair(
+                        name="FUNCTIONS_WORKER_RUNTIME",
+                        value="python"
+                    ),
+                    # Add any other settings here, e.g.:
+                    # NameValuePair(name="SETTING_KEY", value="SETTING_VALUE"),
+                ]
+            )
+
+            # Create the Function App with the custom site configuration
+            function_app_site = Site(
+                location=LOCATION,
+                kind="functionapp",
+                site_config=site_config
+            )
+
+            function_client.web_apps.begin_create_or_update(
+                RESOURCE_GROUP,
+                FUNCTION_APP_NAME,
+                function_app_site,
+                polling_interval=LRO_POLLING_INTERVAL
+            ).result()
 
-        # Create the Function App with the custom site configuration
-        function_app_site = Site(
-            location=LOCATION,
-            kind="functionapp",
-            site_config=site_config
+            logging.info(f"✅ Azure Function App '{FUNCTION_APP_NAME}' created using the existing storage account!")
+    except Exception as e:
+        logging.error(f"Error managing Azure Function App: {str(e)}")
+        raise
+
+def create_app_insights(app_insights_name):
+    """Create an Application Insights component"""
+    from azure.mgmt.applicationinsights import ApplicationInsightsManagementClient
+    app_insights_client = ApplicationInsightsManagementClient(credential, SUBSCRIPTION_ID, transport=transport)
+    app_insights_params = {
+        "location": LOCATION,
+        "kind": "web",
+        "application_type": "web"
+    }
+    app_insights_client.components.create_or_update(RESOURCE_GROUP, app_insights_name, app_insights_params)
+
+def create_log_analytics(log_analytics_name):
+    """Create a Log Analytics workspace"""
+    from azure.mgmt.loganalytics import LogAnalyticsManagementClient
+    log_analytics_client = LogAnalyticsManagementClient(credential, SUBSCRIPTION_ID, transport=transport)
+    log_analytics_params = {
+        "location": LOCATION,
+        "sku": {
+            "name": "PerGB2018"
+        },
+        "retention_in_days": 30
+    }
+    log_analytics_client.workspaces.create_or_update(RESOURCE_GROUP, log_analytics_name, log_analytics_params)
+
+def create_key_vault(key_vault_name):
+    """Create a Key Vault"""
+    from azure.mgmt.keyvault import KeyVaultManagementClient
+    from azure.mgmt.keyvault.models import VaultCreateOrUpdateParameters, VaultProperties, Sku
+    key_vault_client = KeyVaultManagementClient(credential, SUBSCRIPTION_ID, transport=transport)
+    key_vault_params = VaultCreateOrUpdateParameters(
+        location=LOCATION,
+        properties=VaultProperties(
+            tenant_id=os.environ.get("AZURE_TENANT_ID", "your-tenant-id"),
+            sku=Sku(name="standard", family="A"),
+            access_policies=[],
+            enabled_for_deployment=True,
+            enabled_for_disk_encryption=True,
+            enabled_for_template_deployment=True
         )
+    )
+    key_vault_client.vaults.create_or_update(RESOURCE_GROUP, key_vault_name, key_vault_params)
 
-        function_app = function_client.web_apps.begin_create_or_update(
-            RESOURCE_GROUP,
-            FUNCTION_APP_NAME,
-            function_app_site
-        ).result()
+# Optional services, keyed by their flag under "related_services" in config:
+# (display name, ARM resource type, resource name, create function)
+RELATED_SERVICES = {
+    "app_insights": ("Application Insights", "Microsoft.Insights/components", APP_INSIGHTS_NAME, create_app_insights),
+    "log_analytics": ("Log Analytics workspace", "Microsoft.OperationalInsights/workspaces", LOG_ANALYTICS_NAME, create_log_analytics),
+    "key_vault": ("Key Vault", "Microsoft.KeyVault/vaults", KEY_VAULT_NAME, create_key_vault),
+}
 
-        logging.info(f"✅ Azure Function App '{FUNCTION_APP_NAME}' created using the existing storage account!")
-except Exception as e:
-    logging.error(f"Error managing Azure Function App: {str(e)}")
-    raise
+def provision_related_service(service_type):
+    """
+    Provision one of the RELATED_SERVICES if it is enabled in config
 
-# Get Function App Details
-FUNCTION_APP_URL = f"https://{FUNCTION_APP_NAME}.azurewebsites.net"
+    Args:
+        service_type: Key of the service in RELATED_SERVICES
 
-# Track related resources
-related_resources = {}
+    Returns:
+        str: Name of the resource, or None if it is disabled or could not be provisioned
+    """
+    display_name, resource_type, resource_name, create = RELATED_SERVICES[service_type]
+    try:
+        if service_type not in SETTINGS_CONFIG.related_services:
+            return None
 
-# Check if Application Insights exists (if enabled in config)
-try:
-    if "related_services" in resource_config and resource_config["related_services"].get("app_insights", False):
-        from azure.mgmt.applicationinsights import ApplicationInsightsManagementClient
-        
-        logging.info("🔹 Checking if Application Insights exists...")
-        app_insights_client = ApplicationInsightsManagementClient(credential, SUBSCRIPTION_ID)
-        
-        # Use resource prefix for consistent naming
-        app_insights_name = f"{resource_config.get('prefix', 'handwrit')}insights{FUNCTION_APP_NAME.lower()[:8]}"
-        
-        # Check if it exists
-        app_insights_exists = False
-        try:
-            app_insights = app_insights_client.components.get(RESOURCE_GROUP, app_insights_name)
-            app_insights_exists = True
-            logging.info(f"✅ Application Insights '{app_insights_name}' already exists.")
-            related_resources["app_insights"] = app_insights_name
-        except Exception:
-            app_insights_exists = False
-        
-        if not app_insights_exists:
-            logging.info(f"🔹 Creating Application Insights '{app_insights_name}'...")
-            # Create Application Insights
-            app_insights_params = {
-                "location": LOCATION,
-                "kind": "web",
-                "application_type": "web"
-            }
-            app_insights = app_insights_client.components.create_or_update(
-                RESOURCE_GROUP, 
-                app_insights_name, 
-                app_insights_params
-            )
-            logging.info(f"✅ Application Insights '{app_insights_name}' created.")
-            related_resources["app_insights"] = app_insights_name
-except Exception as e:
-    logging.warning(f"Could not check/create Application Insights: {str(e)}")
-    logging.warning("This is non-critical and the deployment will continue.")
+        # Check if it exists; the create functions only import their SDK when needed
+        logging.info(f"🔹 Checking if {display_name} exists...")
+        if resource_exists(resource_type, resource_name):
+            logging.info(f"✅ {display_name} '{resource_name}' already exists.")
+        else:
+            logging.info(f"🔹 Creating {display_name} '{resource_name}'...")
+            create(resource_name)
+            logging.info(f"✅ {display_name} '{resource_name}' created.")
+        return resource_name
+    except Exception as e:
+        logging.warning(f"Could not check/create {display_name}: {str(e)}")
+        logging.warning("This is non-critical and the deployment will continue.")
+        return None
 
-# Check if Log Analytics exists (if enabled in config)
-try:
-    if "related_services" in resource_config and resource_config["related_services"].get("log_analytics", False):
-        from azure.mgmt.loganalytics import LogAnalyticsManagementClient
-        
-        logging.info("🔹 Checking if Log Analytics workspace exists...")
-        log_analytics_client = LogAnalyticsManagementClient(credential, SUBSCRIPTION_ID)
-        
-        # Use resource prefix for consistent naming
-        log_analytics_name = f"{resource_config.get('prefix', 'handwrit')}logalytic{FUNCTION_APP_NAME.lower()[:8]}"
-        
-        # Check if it exists
-        log_analytics_exists = False
-        try:
-            log_analytics = log_analytics_client.workspaces.get(RESOURCE_GROUP, log_analytics_name)
-            log_analytics_exists = True
-            logging.info(f"✅ Log Analytics workspace '{log_analytics_name}' already exists.")
-            related_resources["log_analytics"] = log_analytics_name
-        except Exception:
-            log_analytics_exists = False
-        
-        if not log_analytics_exists:
-            logging.info(f"🔹 Creating Log Analytics workspace '{log_analytics_name}'...")
-            # Create Log Analytics workspace
-            log_analytics_params = {
-                "location": LOCATION,
-                "sku": {
-                    "name": "PerGB2018"
-                },
-                "retention_in_days": 30
-            }
-            log_analytics = log_analytics_client.workspaces.create_or_update(
-                RESOURCE_GROUP, 
-                log_analytics_name, 
-                log_analytics_params
-            )
-            logging.info(f"✅ Log Analytics workspace '{log_analytics_name}' created.")
-            related_resources["log_analytics"] = log_analytics_name
-except Exception as e:
-    logging.warning(f"Could not check/create Log Analytics workspace: {str(e)}")
-    logging.warning("This is non-critical and the deployment will continue.")
+# Provision the independent resources in parallel. Event Hubs wait on their
+# namespace inside provision_event_hubs, and the Function App waits on the ML
+# workspace for its storage account; everything else overlaps.
+with ThreadPoolExecutor(max_workers=6) as executor:
+    event_hubs_future = executor.submit(provision_event_hubs)
+    ml_workspace_future = executor.submit(provision_ml_workspace)
+    related_futures = {
+        service_type: executor.submit(provision_related_service, service_type)
+        for service_type in RELATED_SERVICES
+    }
 
-# Check if Key Vault exists (if enabled in config)
-try:
-    if "related_services" in resource_config and resource_config["related_services"].get("key_vault", False):
-        from azure.mgmt.keyvault import KeyVaultManagementClient
-        from azure.mgmt.keyvault.models import VaultCreateOrUpdateParameters, VaultProperties, Sku, AccessPolicyEntry
-        
-        logging.info("🔹 Checking if Key Vault exists...")
-        key_vault_client = KeyVaultManagementClient(credential, SUBSCRIPTION_ID)
-        
-        # Use resource prefix for consistent naming
-        key_vault_name = f"{resource_config.get('prefix', 'handwrit')}keyvault{FUNCTION_APP_NAME.lower()[:8]}"
-        
-        # Check if it exists
-        key_vault_exists = False
-        try:
-            key_vault = key_vault_client.vaults.get(RESOURCE_GROUP, key_vault_name)
-            key_vault_exists = True
-            logging.info(f"✅ Key Vault '{key_vault_name}' already exists.")
-            related_resources["key_vault"] = key_vault_name
-        except Exception:
-            key_vault_exists = False
-        
-        if not key_vault_exists:
-            logging.info(f"🔹 Creating Key Vault '{key_vault_name}'...")
-            # Create Key Vault
-            key_vault_params = VaultCreateOrUpdateParameters(
-                location=LOCATION,
-                properties=VaultProperties(
-                    tenant_id=os.environ.get("AZURE_TENANT_ID", "your-tenant-id"),
-                    sku=Sku(name="standard", family="A"),
-                    access_policies=[],
-                    enabled_for_deployment=True,
-                    enabled_for_disk_encryption=True,
-                    enabled_for_template_deployment=True
-                )
-            )
-            key_vault = key_vault_client.vaults.create_or_update(
-                RESOURCE_GROUP, 
-                key_vault_name, 
-                key_vault_params
-            )
-            logging.info(f"✅ Key Vault '{key_vault_name}' created.")
-            related_resources["key_vault"] = key_vault_name
-except Exception as e:
-    logging.warning(f"Could not check/create Key Vault: {str(e)}")
-    logging.warning("This is non-critical and the deployment will continue.")
+    ML_WORKSPACE_NAME, STORAGE_ACCOUNT_NAME, STORAGE_KEY, STORAGE_CONNECTION_STRING = ml_workspace_future.result()
+    function_app_future = executor.submit(provision_function_app, STORAGE_CONNECTION_STRING)
+
+    EVENT_HUB_CONNECTION_STRING = event_hubs_future.result()
+    function_app_future.result()
+
+    # Track related resources
+    related_resources = {}
+    for service_type, future in related_futures.items():
+        service_name = future.result()
+        if service_name:
+            related_resources[service_type] = service_name
+
+# Get Function App Details
+FUNCTION_APP_URL = f"https://{FUNCTION_APP_NAME}.azurewebsites.net"
+
+# Derived locally from the account name rather than fetched with get_properties
+STORAGE_BLOB_ENDPOINT = f"https://{STORAGE_ACCOUNT_NAME}.blob.core.windows.net"
 
 # Save runtime settings to local.settings.json using ConfigurationManager
 try:
@@ -526,18 +735,14 @@ try:
     }
     
     # Get ML workspace endpoints from configuration
-    ml_endpoints = resource_config["ml_workspace"]["endpoints"]
-    prediction_region = ml_endpoints["prediction"]["region"]
-    prediction_path = ml_endpoints["prediction"]["path"]
-    training_region = ml_endpoints["training"]["region"]
-    training_path = ml_endpoints["training"]["path"]
+    ml_endpoints = SETTINGS_CONFIG.ml_endpoints
     
         # Prepare endpoints
     endpoints = {
         # ML workspace settings
-        "AZURE_ML_PREDICTION_ENDPOINT": f"https://{ML_WORKSPACE_NAME}.{prediction_region}.inference.azureml.net/{prediction_path}",
+        "AZURE_ML_PREDICTION_ENDPOINT": f"https://{ML_WORKSPACE_NAME}.{ml_endpoints.prediction_region}.inference.azureml.net/{ml_endpoints.prediction_path}",
         "AZURE_ML_KEY": "your-ml-auth-key",  # You'll need to retrieve this manually
-        "AZURE_ML_TRAINING_ENDPOINT": f"https://{ML_WORKSPACE_NAME}.{training_region}.training.azureml.net/{training_path}",
+        "AZURE_ML_TRAINING_ENDPOINT": f"https://{ML_WORKSPACE_NAME}.{ml_endpoints.training_region}.training.azureml.net/{ml_endpoints.training_path}",
         
         # Event Hub settings
         "EventHubConnectionString": EVENT_HUB_CONNECTION_STRING,
@@ -550,8 +755,11 @@ try:
         "AZURE_ML_RESOURCE_GROUP": RESOURCE_GROUP,
         "AZURE_ML_SUBSCRIPTION_ID": SUBSCRIPTION_ID,
         "AZURE_ML_TENANT_ID": os.environ.get("AZURE_TENANT_ID", "your-tenant-id"),
-        "AZURE_ML_MODEL_NAME": resource_config["ml_workspace"]["model_name"],
-        "AZURE_ML_EXPERIMENT_NAME": resource_config["ml_workspace"]["experiment_name"],
+        "AZURE_ML_MODEL_NAME": SETTINGS_CONFIG.ml_model_name,
+        "AZURE_ML_EXPERIMENT_NAME": SETTINGS_CONFIG.ml_experiment_name,
+        
+        # Storage settings
+        "AZURE_STORAGE_BLOB_ENDPOINT": STORAGE_BLOB_ENDPOINT,
         
         # Datastore names
         "AZURE_TRAINING_DATASTORE_NAME": "image_store",
@@ -559,11 +767,11 @@ try:
         "AZURE_MODELS_CONTAINER_NAME": "azureml",
         
         # Form recognizer settings
-        "AZURE_FORM_RECOGNIZER_ENDPOINT": resource_config["form_recognizer"]["endpoint"],
-        "AZURE_FORM_RECOGNIZER_KEY": resource_config["form_recognizer"]["key"],
+        "AZURE_FORM_RECOGNIZER_ENDPOINT": SETTINGS_CONFIG.form_recognizer_endpoint,
+        "AZURE_FORM_RECOGNIZER_KEY": SETTINGS_CONFIG.form_recognizer_key,
         
         # Function app settings
-        "FUNCTIONS_WORKER_RUNTIME": resource_config["function_app"]["runtime"],
+        "FUNCTIONS_WORKER_RUNTIME": SETTINGS_CONFIG.function_app_runtime,
         
         # Resource identifiers for deletion
         "AZURE_EVENT_HUB_NAMESPACE": EVENT_HUB_NAMESPACE,
@@ -576,7 +784,7 @@ try:
         "AZURE_KEY_VAULT": related_resources.get("key_vault", ""),
         
         # Resource prefix for deletion
-        "AZURE_RESOURCE_PREFIX": resource_config.get("prefix", "handwrit")
+        "AZURE_RESOURCE_PREFIX": PREFIX
     }
     
     # Update settings using ConfigurationManager